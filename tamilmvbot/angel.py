@@ -3,14 +3,21 @@ import time
 from dotenv import load_dotenv
 import telebot
 from telebot import types
-import requests
-from bs4 import BeautifulSoup
+from flask import Flask, request
+from waitress import serve
+from cachetools import TTLCache
+from selectolax.lexbor import LexborHTMLParser
 import logging
 import threading
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 try:
     from tamilmvbot.hotstar_handler import HotstarMonitor
+    from tamilmvbot.http_client import HTTP2_CLIENT, SESSION, get_with_retries
 except ImportError:
     from hotstar_handler import HotstarMonitor
+    from http_client import HTTP2_CLIENT, SESSION, get_with_retries
 
 # Configure logging
 logging.basicConfig(
@@ -23,15 +30,30 @@ load_dotenv()
 # ============ WOODctaft =================
 TOKEN = os.getenv('TOKEN', '5497255628:AAEwBfKmLKJIb5O_MKy8fEVgxyOk19-WkJs')
 TAMILMV_URL = os.getenv('TAMILMV_URL', 'https://www.1tamilmv.fi')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+PORT = int(os.getenv('PORT', 3000))
 # ========================================
 bot = telebot.TeleBot(TOKEN, parse_mode='HTML')
+app = Flask(__name__)
 
 # Initialize Hotstar Monitor
 hotstar_monitor = HotstarMonitor()
 
-# Global variables
-movie_list = []
-real_dict = {}
+# Per-chat (movie_list, real_dict) from the last /view, kept for 10 minutes
+STATE = TTLCache(maxsize=1000, ttl=600)
+state_lock = threading.Lock()
+
+# Last parsed homepage per URL as (content digest, entries)
+parsed_homepages = {}
+
+# Telegram webhook endpoint
+
+
+@app.route(f'/{TOKEN}', methods=['POST'])
+def webhook():
+    update = telebot.types.Update.de_json(request.get_data().decode('utf-8'))
+    bot.process_new_updates([update])
+    return '', 200
 
 # /start command
 
@@ -86,16 +108,26 @@ def run_monitor_loop():
             hotstar_monitor.check_updates(bot)
         except Exception as e:
             logger.error(f"Error in monitor loop: {e}")
-        time.sleep(600) # Check every 10 minutes
+        # Check every 10 minutes, or as soon as a new show is added
+        hotstar_monitor.wake.wait(timeout=600)
+        hotstar_monitor.wake.clear()
 
 # /view command
 
 
 @bot.message_handler(commands=['view'])
 def start(message):
-    bot.send_message(message.chat.id, "<b>🧲 Please wait for 10 ⏰ seconds</b>")
-    global movie_list, real_dict
-    movie_list, real_dict = tamilmv()
+    chat_id = message.chat.id
+    with state_lock:
+        state = STATE.get(chat_id)
+
+    if state is None:
+        bot.send_message(chat_id, "<b>🧲 Please wait for 10 ⏰ seconds</b>")
+        state = tamilmv()
+        if state[0]:
+            with state_lock:
+                STATE[chat_id] = state
+    movie_list, real_dict = state
 
     combined_caption = """<b><blockquote>🔗 Select a Movie from the list 🎬</blockquote></b>\n\n🔘 Please select a movie:"""
     keyboard = makeKeyboard(movie_list)
@@ -108,19 +140,57 @@ def start(message):
     )
 
 
+@bot.message_handler(commands=['refresh'])
+def refresh(message):
+    get_movie_details.cache_clear()
+    # Also drop the cached homepage so /view sees the current movie list
+    SESSION.cache.delete(urls=[TAMILMV_URL])
+    with state_lock:
+        STATE.pop(message.chat.id, None)
+    bot.reply_to(message, "♻️ Movie cache cleared. Use /view to fetch fresh links.")
+
+
 @bot.callback_query_handler(func=lambda call: True)
 def callback_query(call):
-    global real_dict
-    for key, value in enumerate(movie_list):
-        if call.data == f"{key}":
-            if value in real_dict.keys():
-                for i in real_dict[value]:
-                    bot.send_message(call.message.chat.id, text=i)
+    chat_id = call.message.chat.id
+    with state_lock:
+        state = STATE.get(chat_id)
+
+    if state is None:
+        # The chat's /view results have expired from STATE
+        bot.answer_callback_query(call.id, "List expired, send /view again")
+        return
+    movie_list, real_dict = state
+
+    # callback_data is the movie's index in movie_list
+    try:
+        title = movie_list[int(call.data)]
+    except (ValueError, IndexError):
+        bot.answer_callback_query(call.id, "Unknown movie, send /view again")
+        return
+
+    bot.answer_callback_query(call.id)
+    # Send in list order; Telegram also rate-limits bursts to a single chat
+    for text in real_dict.get(title, []):
+        send_text(chat_id, text)
+
+
+def send_text(chat_id, text):
+    try:
+        bot.send_message(chat_id, text=text)
+    except Exception as e:
+        logger.error(f"Failed to send message to {chat_id}: {e}")
 
 
 def makeKeyboard(movie_list):
+    return _keyboard_cached(tuple(movie_list))
+
+
+@functools.lru_cache(maxsize=4)
+def _keyboard_cached(titles):
+    # The list only changes when the homepage does, so reuse the markup
     markup = types.InlineKeyboardMarkup()
-    for key, value in enumerate(movie_list):
+    for key, value in enumerate(titles):
         markup.add(
             types.InlineKeyboardButton(
                 text=value,
@@ -130,31 +200,34 @@ def makeKeyboard(movie_list):
 
 def tamilmv():
     mainUrl = TAMILMV_URL
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
 
     movie_list = []
     real_dict = {}
 
     try:
-        web = requests.get(mainUrl, headers=headers)
+        web = SESSION.get(mainUrl, timeout=15, expire_after=120)
         web.raise_for_status()
-        soup = BeautifulSoup(web.text, 'lxml')
-
-        temps = soup.find_all('div', {'class': 'ipsType_break ipsContained'})
+        entries = parse_movie_links(mainUrl, web.content)
 
-        if len(temps) < 15:
+        if len(entries) < 15:
             logger.warning("Not enough movies found on the page")
             return [], {}
 
-        for i in range(15):
-            title = temps[i].findAll('a')[0].text.strip()
-            link = temps[i].find('a')['href']
+        links = []
+        for title, link in entries[:15]:
             movie_list.append(title)
+            links.append(link)
+
+        # Detail pages are independent, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(get_movie_details, link) for link in links]
 
-            movie_details = get_movie_details(link)
-            real_dict[title] = movie_details
+            for title, link, future in zip(movie_list, links, futures):
+                try:
+                    real_dict[title] = future.result()
+                except Exception as e:
+                    logger.error(f"Error retrieving movie details for {link}: {e}")
+                    real_dict[title] = []
 
         return movie_list, real_dict
     except Exception as e:
@@ -162,49 +235,77 @@ def tamilmv():
         return [], {}
 
 
-def get_movie_details(url):
-    try:
-        html = requests.get(url, timeout=15)
-        html.raise_for_status()
-        soup = BeautifulSoup(html.text, 'lxml')
+def parse_movie_links(url, html):
+    # Skip the parse when the page is unchanged, e.g. served from the HTTP
+    # cache; only a small digest is kept, not the page itself
+    digest = hashlib.blake2b(html, digest_size=16).digest()
+    cached = parsed_homepages.get(url)
+    if cached and cached[0] == digest:
+        return cached[1]
+
+    tree = LexborHTMLParser(html)
 
-        mag = [a['href'] for a in soup.find_all(
-            'a', href=True) if 'magnet:' in a['href']]
-        filelink = [a['href'] for a in soup.find_all(
-            'a', {"data-fileext": "torrent", 'href': True})]
+    entries = []
+    for temp in tree.css('div.ipsType_break.ipsContained'):
+        anchor = temp.css_first('a')
+        entries.append((anchor.text().strip(), anchor.attributes['href']))
+    entries = tuple(entries)
 
-        movie_details = []
-        movie_title = soup.find('h1').text.strip(
-        ) if soup.find('h1') else "Unknown Title"
+    parsed_homepages[url] = (digest, entries)
+    return entries
 
-        for p in range(len(mag)):
-            torrent_link = filelink[p] if p < len(filelink) else None
-            if torrent_link and not torrent_link.startswith('http'):
-                torrent_link = f'{TAMILMV_URL}{torrent_link}'
 
-            message = f"""
+@functools.lru_cache(maxsize=256)
+def get_movie_details(url):
+    # Posts don't change once published, so results are memoized per URL.
+    # Errors, including pages without any magnet links, propagate to the
+    # caller and are therefore never cached.
+    html = get_with_retries(HTTP2_CLIENT, url)
+    html.raise_for_status()
+    tree = LexborHTMLParser(html.content)
+
+    # Collect magnets and torrent files in one walk over the anchors
+    mag, filelink = [], []
+    for a in tree.css('a[href]'):
+        href = a.attributes['href'] or ''
+        if 'magnet:' in href:
+            mag.append(href)
+        elif a.attributes.get('data-fileext') == 'torrent':
+            filelink.append(href)
+
+    if not mag:
+        # Interstitial page, or a post whose magnets aren't up yet
+        raise ValueError(f"No magnet links found at {url}")
+
+    movie_details = []
+    heading = tree.css_first('h1')
+    movie_title = heading.text().strip() if heading else "Unknown Title"
+
+    for p in range(len(mag)):
+        torrent_link = filelink[p] if p < len(filelink) else None
+        if torrent_link and not torrent_link.startswith('http'):
+            torrent_link = f'{TAMILMV_URL}{torrent_link}'
+
+        message = f"""
 <b>📂 Movie Title:</b>
 <blockquote>{movie_title}</blockquote>
 
 🧲 <b>Magnet Link:</b>
 <pre>{mag[p]}</pre>
 """
-            if torrent_link:
-                message += f"""
+        if torrent_link:
+            message += f"""
 📥 <b>Download Torrent:</b>
 <a href="{torrent_link}">🔗 Click Here</a>
 """
-            else:
-                message += """
+        else:
+            message += """
 📥 <b>Torrent File:</b> Not Available
 """
 
-            movie_details.append(message)
+        movie_details.append(message)
 
-        return movie_details
-    except Exception as e:
-        logger.error(f"Error retrieving movie details: {e}")
-        return []
+    return movie_details
 
 
 if __name__ == "__main__":
@@ -216,6 +317,14 @@ if __name__ == "__main__":
     bot.remove_webhook()
     time.sleep(1)
 
-    # Start polling
-    logger.info("Starting bot polling...")
-    bot.infinity_polling()
+    if WEBHOOK_URL:
+        # Let Telegram push updates to us instead of long-polling
+        bot.set_webhook(url=f"{WEBHOOK_URL.rstrip('/')}/{TOKEN}")
+        logger.info(f"Starting webhook server on port {PORT}...")
+        # In-process WSGI server: a forking server such as gunicorn would
+        # lose the monitor thread and telebot's worker pool in its workers
+        serve(app, host='0.0.0.0', port=PORT)
+    else:
+        # Start polling
+        logger.info("Starting bot polling...")
+        bot.infinity_polling(timeout=30, long_polling_timeout=30)
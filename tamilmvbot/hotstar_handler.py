@@ -1,36 +1,134 @@
-import json
+import mmap
 import os
+import orjson
 import time
-import requests
 import threading
 import logging
 import re
 import datetime
-from bs4 import BeautifulSoup
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from selectolax.lexbor import LexborHTMLParser
+try:
+    from tamilmvbot.http_client import SESSION
+except ImportError:
+    from http_client import SESSION
 
 logger = logging.getLogger(__name__)
 
+HOTSTAR_HEADERS = {
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Referer': 'https://www.google.com/'
+}
+
+# Episode links look like .../episode-name/1641016181/watch; short
+# numeric IDs belong to other pages, so require at least 8 digits
+EPISODE_RE = re.compile(r'/([a-z0-9-]+)/(\d{8,})(?:/watch)?/?$', re.IGNORECASE)
+
+# Episode IDs remembered per show beyond those still listed on its page;
+# older IDs are dropped first
+MAX_KNOWN_EPISODES = 500
+
+# Data files at least this large are parsed from a memory map
+MMAP_THRESHOLD = 1024 * 1024
+
+def parse_episodes(html_content):
+    """Parse episode entries out of a show page."""
+    tree = LexborHTMLParser(html_content)
+
+    episodes = []
+
+    # Strategy 1: Look for JSON state (removed dead code)
+    # We rely on Strategy 2 (HTML parsing) as it covers the requirement for SSR links.
+
+    # Strategy 2: Improved HTML parsing
+    # We look for any anchor that links to an episode
+    # Episode structure: .../episode-name/id/watch
+
+    links = tree.css('a[href]')
+    for link in links:
+        href = link.attributes['href'] or ''
+
+        # Pull slug and episode ID out of .../episode-name/id[/watch]
+        match = EPISODE_RE.search(href)
+        if not match:
+            continue
+        slug, ep_id = match.group(1), match.group(2)
+
+        # Construct full URL
+        full_link = href if href.startswith('http') else f"https://www.hotstar.com{href}"
+
+        # Basic title extraction
+        title = link.text(strip=True)
+
+        # Check for date in text (e.g. "Today", "20 May", etc)
+        # Since we only iterate 'a', we check the anchor text.
+        is_today = "today" in title.lower()
+
+        if not title and slug != 'shows':
+            # Fall back to the URL slug
+            # .../arjuns-support-for-bhargavi/1641016181/watch
+            title = slug.replace('-', ' ').title()
+
+        if not title:
+            title = f"Episode {ep_id}"
+
+        episodes.append({
+            'id': ep_id,
+            'link': full_link,
+            'title': title,
+            'is_today': is_today
+        })
+
+    # Deduplicate by ID
+    unique_episodes = {e['id']: e for e in episodes}.values()
+    return tuple(unique_episodes)
+
+
 class HotstarMonitor:
     def __init__(self, data_file='hotstar_subs.json'):
         self.data_file = data_file
         self.subscriptions = self.load_data()
+        # In-memory lookup sets mirroring each show's 'known_episodes' list
+        self.known_ids = {url: set(data['known_episodes'])
+                          for url, data in self.subscriptions.items()}
         self.lock = threading.Lock()
+        # Last parse per show as (content digest, episodes), so a page served
+        # unchanged from the HTTP cache is not parsed again
+        self._parsed = {}
+        self._dirty = False
+        # Set to wake the monitor loop before its next scheduled check
+        self.wake = threading.Event()
 
     def load_data(self):
         if os.path.exists(self.data_file):
             try:
-                with open(self.data_file, 'r') as f:
-                    return json.load(f)
+                with open(self.data_file, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                                memoryview(mm) as view:
+                            return orjson.loads(view)
+                    return orjson.loads(f.read())
             except Exception as e:
                 logger.error(f"Error loading hotstar data: {e}")
         return {}
 
     def save_data(self):
         with self.lock:
+            if not self._dirty:
+                return
+            # Clear before serializing so a failed write can flag it again
+            self._dirty = False
             try:
-                with open(self.data_file, 'w') as f:
-                    json.dump(self.subscriptions, f, indent=4)
+                # Write to a temp file and swap it in, so a crash mid-write
+                # never leaves a truncated data file behind
+                tmp_file = f"{self.data_file}.tmp"
+                with open(tmp_file, 'wb') as f:
+                    f.write(orjson.dumps(
+                        self.subscriptions, option=orjson.OPT_INDENT_2))
+                os.replace(tmp_file, self.data_file)
             except Exception as e:
+                self._dirty = True
                 logger.error(f"Error saving hotstar data: {e}")
 
     def add_show(self, chat_id, url):
@@ -41,12 +139,18 @@ class HotstarMonitor:
             return False, "Invalid URL. Please provide a valid Hotstar show URL."
 
         if url in self.subscriptions:
-            if chat_id not in self.subscriptions[url]['subscribers']:
-                self.subscriptions[url]['subscribers'].append(chat_id)
-                self.save_data()
-                return True, "Added to existing monitor list."
-            else:
+            # Mutate and flag under the lock so a concurrent save can't drop it
+            with self.lock:
+                subscribers = self.subscriptions[url]['subscribers']
+                added = chat_id not in subscribers
+                if added:
+                    subscribers.append(chat_id)
+                    self._dirty = True
+
+            if not added:
                 return False, "You are already monitoring this show."
+            self.save_data()
+            return True, "Added to existing monitor list."
 
         # Initial scrape to get current state
         episodes = self.scrape_episodes(url)
@@ -70,14 +174,20 @@ class HotstarMonitor:
              # Check for any episodes from "Today"
              todays_episodes = [e for e in episodes if e.get('is_today', False)]
 
-        self.subscriptions[url] = {
-            'subscribers': [chat_id],
-            'known_episodes': known_episodes,
-            'last_check': time.time(),
-            'title': self.extract_title(url),
-            'initialized': (episodes is not None)
-        }
+        with self.lock:
+            self.known_ids[url] = set(known_episodes)
+            self.subscriptions[url] = {
+                'subscribers': [chat_id],
+                'known_episodes': known_episodes,
+                'last_check': time.time(),
+                'title': self.extract_title(url),
+                'initialized': (episodes is not None)
+            }
+            self._dirty = True
         self.save_data()
+        if episodes is None:
+            # Retry the failed initial scrape without waiting a full interval
+            self.wake.set()
 
         # Special case: If found today's episode on first add, return it in the message
         # But we return a simple string, so we can't notify via return value easily.
@@ -90,6 +200,22 @@ class HotstarMonitor:
 
         return True, f"Started monitoring. {status_msg}"
 
+    def remember_episodes(self, url, current_ids):
+        """
+        Record the IDs currently listed for a show, trimming older ones.
+        IDs still on the page are always kept so they never come back as new.
+        """
+        data = self.subscriptions[url]
+        current_ids = list(dict.fromkeys(current_ids))
+        on_page = set(current_ids)
+
+        older = [i for i in data['known_episodes'] if i not in on_page]
+        keep = max(0, MAX_KNOWN_EPISODES - len(current_ids))
+        older = older[-keep:] if keep else []
+
+        data['known_episodes'] = older + current_ids
+        self.known_ids[url] = set(data['known_episodes'])
+
     def extract_title(self, url):
         # unexpected format: https://www.hotstar.com/in/shows/bhargavi-ll-b/1271396039/
         try:
@@ -103,131 +229,117 @@ class HotstarMonitor:
         return "Unknown Show"
 
     def scrape_episodes(self, url):
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Referer': 'https://www.google.com/'
-        }
+        content = self.fetch_page(url)
+        if content is None:
+            return None
         try:
-            response = requests.get(url, headers=headers, timeout=20)
-            response.raise_for_status()
-            html_content = response.text
-            soup = BeautifulSoup(html_content, 'lxml')
-
-            episodes = []
-
-            # Strategy 1: Look for JSON state (removed dead code)
-            # We rely on Strategy 2 (HTML parsing) as it covers the requirement for SSR links.
-
-            # Strategy 2: Improved HTML parsing
-            # We look for any anchor that links to an episode
-            # Episode structure: .../episode-name/id/watch
-
-            links = soup.find_all('a', href=True)
-            for link in links:
-                href = link['href']
-
-                # Check for 'watch' or digit pattern
-                if 'watch' in href or (href.split('/')[-1].isdigit() and len(href.split('/')[-1]) > 5):
-                     # Construct full URL
-                     full_link = href if href.startswith('http') else f"https://www.hotstar.com{href}"
-
-                     # Extract ID
-                     parts = full_link.strip('/').split('/')
-                     ep_id = parts[-1]
-                     if ep_id == 'watch' and len(parts) > 1:
-                         ep_id = parts[-2]
-
-                     # Filter out short IDs (likely not episodes)
-                     if not ep_id.isdigit() or len(ep_id) < 8:
-                         continue
-
-                     # Basic title extraction
-                     title = link.get_text(strip=True)
-
-                     # Check for date in text (e.g. "Today", "20 May", etc)
-                     is_today = False
-                     # Look at parent text for date context if needed, but often it's inside the anchor or sibling
-                     # Simple heuristic: Check if title or nearby text says "Today"
-                     # Since we only iterate 'a', we check the anchor text.
-                     if "today" in title.lower():
-                         is_today = True
-
-                     # Note: Finding date in list view is hard without specific selectors.
-                     # We assume if the user sees "Today" in the title/desc, we capture it.
-
-                     if not title:
-                         # Try to get title from URL slug
-                         # .../arjuns-support-for-bhargavi/1641016181/watch
-                         # Slug is usually parts[-3] if ID is -2
-                         try:
-                             if len(parts) >= 3:
-                                 slug = parts[-3]
-                                 if slug != 'shows':
-                                     title = slug.replace('-', ' ').title()
-                         except:
-                             pass
-
-                     if not title:
-                         title = f"Episode {ep_id}"
-
-                     episodes.append({
-                         'id': ep_id,
-                         'link': full_link,
-                         'title': title,
-                         'is_today': is_today
-                     })
-
-            # Deduplicate by ID
-            unique_episodes = {e['id']: e for e in episodes}.values()
-            return list(unique_episodes)
+            return self.parse_page(url, content)
+        except Exception as e:
+            logger.error(f"Scraping error for {url}: {e}")
+            return None
 
+    def fetch_page(self, url):
+        try:
+            response = SESSION.get(
+                url, headers=HOTSTAR_HEADERS, timeout=20, expire_after=600)
+            response.raise_for_status()
+            return response.content
         except Exception as e:
             logger.error(f"Scraping error for {url}: {e}")
             return None
 
+    def parse_page(self, url, content):
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        cached = self._parsed.get(url)
+        if cached and cached[0] == digest:
+            episodes = cached[1]
+        else:
+            episodes = parse_episodes(content)
+            self._parsed[url] = (digest, episodes)
+
+        # Hand out copies so callers never share the memoized dicts
+        return [dict(e) for e in episodes]
+
+    def parse_pages(self, pages):
+        """
+        Parse fetched pages into episode lists, keyed by URL.
+        Failed fetches or parses map to None.
+        """
+        results = {}
+        for url, content in pages.items():
+            results[url] = None
+            if content is None:
+                continue
+            try:
+                results[url] = self.parse_page(url, content)
+            except Exception as e:
+                logger.error(f"Scraping error for {url}: {e}")
+        return results
+
     def check_updates(self, bot_instance):
         """
         Iterate through subscriptions and check for new episodes.
         """
         notifications = []
+        urls = list(self.subscriptions)
+
+        # Fetching is network-bound, so download every show concurrently
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            pages = dict(zip(urls, executor.map(self.fetch_page, urls)))
+        results = self.parse_pages(pages)
 
-        for url, data in self.subscriptions.items():
-            current_episodes = self.scrape_episodes(url)
-
-            # Use 'initialized' flag to prevent spam on first successful scrape after a failure
-            initialized = data.get('initialized', True)
-
-            if current_episodes:
-                known_ids = set(data['known_episodes'])
-                new_episodes = [e for e in current_episodes if e['id'] not in known_ids]
-
-                if new_episodes:
-                    # Update known episodes
-                    for ep in new_episodes:
-                        data['known_episodes'].append(ep['id'])
-
-                    # Only notify if we were already initialized.
-                    # If this is the first successful scrape (and we weren't initialized),
-                    # we just silently update the known list to avoid spamming "all existing episodes".
-                    if initialized:
-                        # Prepare notifications
-                        for subscriber in data['subscribers']:
-                            for ep in new_episodes:
-                                notifications.append({
-                                    'chat_id': subscriber,
-                                    'text': f"🎬 <b>New Episode Detected!</b>\n\n<b>Show:</b> {data['title']}\n<b>Episode:</b> {ep['title']}\n\n🔗 {ep['link']}"
-                                })
-                        logger.info(f"Found {len(new_episodes)} new episodes for {url}")
-                    else:
-                         logger.info(f"Initialized episodes for {url} (silent update)")
-                         data['initialized'] = True
-
-                    self.save_data()
-
-        # Send notifications
+        with self.lock:
+            for url, current_episodes in results.items():
+                data = self.subscriptions.get(url)
+                if data is None:
+                    continue
+
+                # Use 'initialized' flag to prevent spam on first successful scrape after a failure
+                initialized = data.get('initialized', True)
+
+                if current_episodes:
+                    known_ids = self.known_ids[url]
+                    new_episodes = [e for e in current_episodes if e['id'] not in known_ids]
+
+                    if new_episodes:
+                        # Update known episodes
+                        self.remember_episodes(url, [e['id'] for e in current_episodes])
+
+                        # Only notify if we were already initialized.
+                        # If this is the first successful scrape (and we weren't initialized),
+                        # we just silently update the known list to avoid spamming "all existing episodes".
+                        if initialized:
+                            # Prepare notifications
+                            for subscriber in data['subscribers']:
+                                for ep in new_episodes:
+                                    notifications.append({
+                                        'chat_id': subscriber,
+                                        'text': f"🎬 <b>New Episode Detected!</b>\n\n<b>Show:</b> {data['title']}\n<b>Episode:</b> {ep['title']}\n\n🔗 {ep['link']}"
+                                    })
+                            logger.info(f"Found {len(new_episodes)} new episodes for {url}")
+                        else:
+                             logger.info(f"Initialized episodes for {url} (silent update)")
+                             data['initialized'] = True
+
+                        self._dirty = True
+
+        # Persist once per pass rather than once per show
+        self.save_data()
+
+        # Group by chat, dropping duplicate texts but keeping their order
+        by_chat = {}
         for notif in notifications:
+            by_chat.setdefault(notif['chat_id'], {})[notif['text']] = None
+
+        # Each chat gets its messages in order (Telegram also rate-limits
+        # bursts to one chat); only different chats are sent in parallel
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            for chat_id, texts in by_chat.items():
+                executor.submit(self.send_notifications, bot_instance, chat_id, list(texts))
+
+    def send_notifications(self, bot_instance, chat_id, texts):
+        for text in texts:
             try:
-                bot_instance.send_message(notif['chat_id'], notif['text'], parse_mode='HTML')
+                bot_instance.send_message(chat_id, text, parse_mode='HTML')
             except Exception as e:
-                logger.error(f"Failed to send notification to {notif['chat_id']}: {e}")
+                logger.error(f"Failed to send notification to {chat_id}: {e}")
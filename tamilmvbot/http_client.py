@@ -0,0 +1,63 @@
+import os
+import time
+import httpx
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# SQLite file for the HTTP cache; defaults to the user's cache directory
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH', '')
+
+
+def create_session():
+    # One pooled session per process so repeated requests to the same
+    # host reuse the TCP/TLS connection instead of handshaking every time.
+    # Successful responses are cached on disk; callers can override the
+    # default lifetime per request with ``expire_after``.
+    session = requests_cache.CachedSession(
+        HTTP_CACHE_PATH or 'tamilmvbot_http_cache',
+        backend='sqlite',
+        use_cache_dir=not HTTP_CACHE_PATH,
+        expire_after=300,
+        allowable_codes=(200,))
+    session.headers.update({'User-Agent': USER_AGENT})
+
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=2, backoff_factor=0.3))
+    session.mount('https://', adapter)
+    return session
+
+
+SESSION = create_session()
+
+
+def create_http2_client():
+    # HTTP/2 multiplexes concurrent requests to one host over a single
+    # connection, which suits fanning out over many pages of the same site.
+    transport = httpx.HTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=10))
+    return httpx.Client(
+        transport=transport,
+        headers={'User-Agent': USER_AGENT},
+        timeout=15,
+        follow_redirects=True)
+
+
+HTTP2_CLIENT = create_http2_client()
+
+
+def get_with_retries(client, url, retries=2, backoff_factor=0.3):
+    # Same policy as the urllib3 Retry on SESSION: connect and read errors
+    # are retried with exponential backoff
+    for attempt in range(retries + 1):
+        try:
+            return client.get(url)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            time.sleep(backoff_factor * (2 ** attempt))
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Keep the HTTP cache created at import time out of the working tree
+os.environ.setdefault(
+    'HTTP_CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'http_cache.sqlite'))
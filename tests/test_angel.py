@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+import pytest
+import httpx
+import requests
+import urllib3
+
+from tamilmvbot import angel, http_client
+
+CHAT_ID = 42
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    calls = {'sent': [], 'answers': []}
+    monkeypatch.setattr(
+        angel.bot, 'send_message',
+        lambda chat_id, text=None, **kwargs: calls['sent'].append((chat_id, text)))
+    monkeypatch.setattr(
+        angel.bot, 'answer_callback_query',
+        lambda call_id, text=None, **kwargs: calls['answers'].append((call_id, text)))
+    angel.STATE.clear()
+    yield calls
+    angel.STATE.clear()
+
+
+@pytest.fixture
+def detail_pages(monkeypatch):
+    # Serves canned detail pages through a stubbed HTTP2_CLIENT.get
+    pages = {}
+
+    def get(url):
+        page = pages[url]
+        if isinstance(page, list):
+            page = page.pop(0)
+        if isinstance(page, Exception):
+            raise page
+        return httpx.Response(200, content=page, request=httpx.Request('GET', url))
+
+    monkeypatch.setattr(angel.HTTP2_CLIENT, 'get', get)
+    monkeypatch.setattr(http_client.time, 'sleep', lambda seconds: None)
+    angel.get_movie_details.cache_clear()
+    yield pages
+    angel.get_movie_details.cache_clear()
+
+
+def detail_page(*anchors):
+    return f'<html><body><h1>Some Movie</h1>{"".join(anchors)}</body></html>'.encode()
+
+
+def make_call(data):
+    return SimpleNamespace(
+        id='call-1', data=data,
+        message=SimpleNamespace(chat=SimpleNamespace(id=CHAT_ID)))
+
+
+def test_expired_list_answers_callback(telegram):
+    angel.callback_query(make_call('0'))
+
+    assert telegram['sent'] == []
+    assert telegram['answers'] == [('call-1', "List expired, send /view again")]
+
+
+def test_refresh_drops_cached_homepage(telegram, monkeypatch):
+    monkeypatch.setattr(angel.bot, 'reply_to', lambda message, text: None)
+    response = requests.Response()
+    response.status_code = 200
+    response.url = angel.TAMILMV_URL
+    response._content = b'<html></html>'
+    response.raw = urllib3.HTTPResponse(
+        status=200, request_url=angel.TAMILMV_URL, preload_content=False)
+    response.request = angel.SESSION.prepare_request(
+        requests.Request('GET', angel.TAMILMV_URL))
+    angel.SESSION.cache.save_response(response)
+    assert angel.SESSION.cache.contains(url=angel.TAMILMV_URL)
+
+    angel.refresh(SimpleNamespace(chat=SimpleNamespace(id=CHAT_ID)))
+
+    assert not angel.SESSION.cache.contains(url=angel.TAMILMV_URL)
+
+
+def test_movie_details_retry_transport_errors(detail_pages):
+    url = 'https://tamilmv.example/post/1'
+    detail_pages[url] = [
+        httpx.ReadError('connection reset'),
+        detail_page('<a href="magnet:?xt=1">Magnet</a>'),
+    ]
+
+    assert len(angel.get_movie_details(url)) == 1
+
+
+def test_callback_sends_selected_movie_links_in_order(telegram):
+    angel.STATE[CHAT_ID] = (
+        ['First', 'Second'],
+        {'First': ['first-1'], 'Second': ['second-1', 'second-2', 'second-3']})
+
+    angel.callback_query(make_call('1'))
+
+    assert telegram['sent'] == [
+        (CHAT_ID, 'second-1'), (CHAT_ID, 'second-2'), (CHAT_ID, 'second-3')]
+    assert telegram['answers'] == [('call-1', None)]
+
+
+@pytest.mark.parametrize('data', ['2', 'not-a-number'])
+def test_callback_with_unknown_index_sends_nothing(telegram, data):
+    angel.STATE[CHAT_ID] = (['First', 'Second'], {'First': ['first-1']})
+
+    angel.callback_query(make_call(data))
+
+    assert telegram['sent'] == []
+    assert telegram['answers'] == [('call-1', "Unknown movie, send /view again")]
+
+
+def test_movie_details_pair_magnets_with_torrent_files(detail_pages):
+    url = 'https://tamilmv.example/post/2'
+    detail_pages[url] = detail_page(
+        '<a href="/forum">Forum</a>',
+        '<a href="magnet:?xt=1">Magnet 1</a>',
+        '<a href="/files/1.torrent" data-fileext="torrent">1.torrent</a>',
+        '<a href="magnet:?xt=2">Magnet 2</a>',
+        '<a href="https://cdn.example/2.torrent" data-fileext="torrent">2.torrent</a>',
+        '<a href="magnet:?xt=3">Magnet 3</a>')
+
+    details = angel.get_movie_details(url)
+
+    assert len(details) == 3
+    assert 'magnet:?xt=1' in details[0]
+    assert f'{angel.TAMILMV_URL}/files/1.torrent' in details[0]
+    assert 'magnet:?xt=2' in details[1]
+    assert 'https://cdn.example/2.torrent' in details[1]
+    assert 'magnet:?xt=3' in details[2]
+    assert 'Not Available' in details[2]
+    assert all('Some Movie' in message for message in details)
+
+
+def test_pages_without_magnets_are_not_memoized(detail_pages):
+    url = 'https://tamilmv.example/post/3'
+    detail_pages[url] = [
+        detail_page('<a href="/forum">Please wait...</a>'),
+        detail_page('<a href="magnet:?xt=1">Magnet</a>'),
+    ]
+
+    with pytest.raises(ValueError):
+        angel.get_movie_details(url)
+
+    assert len(angel.get_movie_details(url)) == 1
+    assert len(angel.get_movie_details(url)) == 1
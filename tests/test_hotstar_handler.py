@@ -0,0 +1,173 @@
+import orjson
+
+from tamilmvbot import hotstar_handler
+from tamilmvbot.hotstar_handler import MAX_KNOWN_EPISODES, HotstarMonitor
+
+SHOW_URL = 'https://www.hotstar.com/in/shows/some-show/1271396039'
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+
+
+def episode_ids(count, start=0):
+    return [str(1600000000 + i) for i in range(start, start + count)]
+
+
+def show_page(ids):
+    anchors = ''.join(
+        f'<a href="/in/shows/some-show/episode-{i}/{i}/watch">Episode {i}</a>'
+        for i in ids)
+    return f'<html><body>{anchors}</body></html>'.encode()
+
+
+def make_monitor(tmp_path, monkeypatch, page_ids):
+    monitor = HotstarMonitor(data_file=str(tmp_path / 'subs.json'))
+    monkeypatch.setattr(monitor, 'fetch_page', lambda url: show_page(page_ids))
+    return monitor
+
+
+def test_page_larger_than_cap_is_not_renotified(tmp_path, monkeypatch):
+    page_ids = episode_ids(MAX_KNOWN_EPISODES + 100)
+    monitor = make_monitor(tmp_path, monkeypatch, page_ids)
+    monitor.add_show(1, SHOW_URL)
+
+    bot = RecordingBot()
+    monitor.check_updates(bot)
+    monitor.check_updates(bot)
+
+    assert bot.sent == []
+
+
+def test_new_episode_on_large_page_is_notified_once(tmp_path, monkeypatch):
+    page_ids = episode_ids(MAX_KNOWN_EPISODES + 100)
+    monitor = make_monitor(tmp_path, monkeypatch, page_ids)
+    monitor.add_show(1, SHOW_URL)
+
+    page_ids.append(episode_ids(1, start=10000)[0])
+    bot = RecordingBot()
+    monitor.check_updates(bot)
+    monitor.check_updates(bot)
+
+    assert len(bot.sent) == 1
+    assert set(page_ids) <= set(monitor.subscriptions[SHOW_URL]['known_episodes'])
+
+
+def test_old_ids_are_trimmed_to_cap(tmp_path, monkeypatch):
+    page_ids = episode_ids(10)
+    monitor = make_monitor(tmp_path, monkeypatch, page_ids)
+    monitor.add_show(1, SHOW_URL)
+    monitor.subscriptions[SHOW_URL]['known_episodes'] = (
+        episode_ids(MAX_KNOWN_EPISODES, start=5000) + page_ids)
+
+    page_ids.append(episode_ids(1, start=10000)[0])
+    monitor.check_updates(RecordingBot())
+
+    known = monitor.subscriptions[SHOW_URL]['known_episodes']
+    assert len(known) == MAX_KNOWN_EPISODES
+    assert known[-len(page_ids):] == page_ids
+
+
+def test_existing_large_subscription_is_not_renotified(tmp_path, monkeypatch):
+    page_ids = episode_ids(MAX_KNOWN_EPISODES + 100)
+    data_file = tmp_path / 'subs.json'
+    data_file.write_bytes(orjson.dumps({
+        SHOW_URL: {
+            'subscribers': ['1'],
+            'known_episodes': page_ids,
+            'last_check': 0,
+            'title': 'Some Show',
+            'initialized': True,
+        }
+    }))
+
+    monitor = make_monitor(tmp_path, monkeypatch, page_ids)
+    bot = RecordingBot()
+    monitor.check_updates(bot)
+
+    assert bot.sent == []
+    assert monitor.subscriptions[SHOW_URL]['known_episodes'] == page_ids
+
+
+def test_saved_data_round_trips(tmp_path, monkeypatch):
+    monkeypatch.setattr(hotstar_handler, 'MMAP_THRESHOLD', 1)
+    page_ids = episode_ids(3)
+    monitor = make_monitor(tmp_path, monkeypatch, page_ids)
+    monitor.add_show(1, SHOW_URL)
+
+    reloaded = HotstarMonitor(data_file=monitor.data_file)
+
+    assert reloaded.subscriptions[SHOW_URL]['known_episodes'] == page_ids
+    assert reloaded.known_ids[SHOW_URL] == set(page_ids)
+
+
+def test_unchanged_page_is_parsed_once(tmp_path, monkeypatch):
+    monitor = HotstarMonitor(data_file=str(tmp_path / 'subs.json'))
+    calls = []
+    parse = hotstar_handler.parse_episodes
+    monkeypatch.setattr(
+        hotstar_handler, 'parse_episodes', lambda c: calls.append(c) or parse(c))
+    page = show_page(episode_ids(3))
+
+    first = monitor.parse_page(SHOW_URL, page)
+    first[0]['title'] = 'changed'
+    second = monitor.parse_page(SHOW_URL, page)
+
+    assert len(calls) == 1
+    assert second[0]['title'] != 'changed'
+
+
+def test_episode_links_with_uppercase_slugs_are_parsed():
+    page = (b'<a href="/in/shows/Some-Show/Arjuns-Support/1641016181/watch"></a>'
+            b'<a href="/in/shows/some-show/12345">Not an episode</a>')
+
+    episodes = hotstar_handler.parse_episodes(page)
+
+    assert [(e['id'], e['title']) for e in episodes] == [
+        ('1641016181', 'Arjuns Support')]
+
+
+def test_failed_save_is_retried(tmp_path, monkeypatch):
+    monitor = make_monitor(tmp_path, monkeypatch, episode_ids(3))
+
+    def fail_replace(src, dst):
+        raise OSError('disk full')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(hotstar_handler.os, 'replace', fail_replace)
+        monitor.add_show(1, SHOW_URL)
+
+    monitor.save_data()
+
+    reloaded = HotstarMonitor(data_file=monitor.data_file)
+    assert SHOW_URL in reloaded.subscriptions
+
+
+def test_notifications_are_sent_in_order_per_chat(tmp_path, monkeypatch):
+    page_ids = episode_ids(2)
+    monitor = make_monitor(tmp_path, monkeypatch, page_ids)
+    monitor.add_show(1, SHOW_URL)
+    monitor.add_show(2, SHOW_URL)
+
+    new_ids = episode_ids(5, start=100)
+    page_ids.extend(new_ids)
+    bot = RecordingBot()
+    monitor.check_updates(bot)
+
+    for chat_id in ('1', '2'):
+        texts = [text for chat, text in bot.sent if chat == chat_id]
+        assert [i for text in texts for i in new_ids if i in text] == new_ids
+
+
+def test_monitor_loop_is_woken_only_after_failed_first_scrape(tmp_path, monkeypatch):
+    monitor = make_monitor(tmp_path, monkeypatch, episode_ids(3))
+    monitor.add_show(1, SHOW_URL)
+    assert not monitor.wake.is_set()
+
+    monkeypatch.setattr(monitor, 'fetch_page', lambda url: None)
+    monitor.add_show(1, SHOW_URL + '/other')
+    assert monitor.wake.is_set()